@@ -9,21 +9,47 @@ Usage:
     python3 health_monitor.py              # Run health check
     python3 health_monitor.py --daily      # Send daily summary
     python3 health_monitor.py --status     # Show current status
+    python3 health_monitor.py --status --deep  # ...and probe health endpoints
     python3 health_monitor.py --discover   # Show discovered containers
+    python3 health_monitor.py --watch      # Long-running: re-check on Docker events
 """
 
 import os
 import sys
+import fcntl
+import signal
 import json
+import re
+import time
+import socket
+import http.client
+import urllib.parse
 import yaml
+import shutil
 import subprocess
-import requests
 import logging
+import queue
 import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
 from datetime import datetime, timedelta
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
+# libyaml's C loader is much faster than the pure-Python one
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+# orjson is optional; state.json falls back to the stdlib json module
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # ============================================================
 # CONFIGURATION
 # ============================================================
@@ -31,19 +57,29 @@ from typing import Dict, List, Optional, Tuple
 SCRIPT_DIR = Path(__file__).parent
 CONFIG_FILE = SCRIPT_DIR / "config.yml"
 STATE_FILE = SCRIPT_DIR / "state.json"
+LOCK_FILE = SCRIPT_DIR / "state.lock"
 LOG_FILE = Path("/root/nkfx/logs/health.log")
+LOG_MAX_BYTES = 10 * 1024 * 1024  # rotate health.log at 10 MB
+LOG_BACKUP_COUNT = 5
 
 # Ensure log directory exists
 LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
 
-# Set up logging
+# Set up logging: callers (including check worker threads) only enqueue
+# records; the listener started in main() does the actual file/console I/O
+_log_formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
+_log_file_handler = RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)
+_log_file_handler.setFormatter(_log_formatter)
+_log_stream_handler = logging.StreamHandler()
+_log_stream_handler.setFormatter(_log_formatter)
+
+_log_queue = queue.SimpleQueue()
+_log_listener = QueueListener(_log_queue, _log_file_handler, _log_stream_handler)
+
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
+    format="%(message)s",  # formatted by the listener's handlers
+    handlers=[QueueHandler(_log_queue)]
 )
 log = logging.getLogger(__name__)
 
@@ -51,144 +87,352 @@ log = logging.getLogger(__name__)
 DEFAULT_AUTO_PATTERNS = ['nkfx', 'mt5', 'vnc', 'kraken', 'pancake', 'n8n', 'qdrant', 'cloudflare', 'bridge']
 CRITICAL_PATTERNS = ['mt5', 'bridge', 'vnc', 'nkfx-smc', 'nkfx-me', 'nkfx-factory', 'n8n', 'cloudflare']
 
+@lru_cache(maxsize=16)
+def _compile_patterns(patterns: Tuple[str, ...]) -> re.Pattern:
+    """Fold substring patterns into one case-insensitive regex (matches nothing if empty)."""
+    if not patterns:
+        return re.compile(r'(?!)')
+    return re.compile('|'.join(map(re.escape, patterns)), re.IGNORECASE)
+
+
+@lru_cache(maxsize=256)
+def _compile_container_pattern(pattern: str) -> re.Pattern:
+    """Compile a service's container_pattern once; invalid regexes match literally."""
+    try:
+        return re.compile(pattern)
+    except re.error:
+        return re.compile(re.escape(pattern))
+
+
+_AUTO_RE = _compile_patterns(tuple(DEFAULT_AUTO_PATTERNS))
+_CRIT_RE = _compile_patterns(tuple(CRITICAL_PATTERNS))
+
+# {container_name: (state, status)} as returned by snapshot_containers(),
+# e.g. {"mt5-bridge": ("running", "Up 3 hours")}
+Snapshot = Dict[str, Tuple[str, str]]
+
+# Container states `docker ps` lists without -a
+LIVE_STATES = ('running', 'restarting', 'paused')
+
+# Telegram message layout
+TELEGRAM_MAX_LENGTH = 4096  # sendMessage rejects longer texts
+DIVIDER = "━━━━━━━━━━━━━━━━━━━━━━"
+STATUS_EMOJI = {  # last_status -> (emoji, daily summary text)
+    "healthy": ("✅", "Running"),
+    "down": ("❌", "DOWN"),
+    "timeout": ("⏱", "Check timed out"),
+}
+UNKNOWN_STATUS = ("❓", "Unknown")
+
+# Short-lived result cache (see cached()): repeat lookups within the TTL are dict hits
+DEFAULT_STATUS_CACHE_TTL = 3.0  # container snapshot; override with settings.status_cache_ttl
+ENDPOINT_CACHE_TTL = 2.0  # health endpoint results
+_ttl_cache: Dict[str, Tuple[float, object]] = {}
+_ttl_cache_lock = threading.Lock()
+
+# Docker Engine API socket; the docker CLI is only used if it's unreachable
+DOCKER_SOCKET = "/var/run/docker.sock"
+
+# Compose locations scanned by auto-discovery
+BOTS_DIR = '/root/nkfx/bots'
+OTHER_COMPOSE_DIRS = [
+    '/root/trading-stack-smc',
+    '/root/nkfx/infrastructure',
+]
+
+# Reuse discovery results while containers and compose dirs are unchanged
+DISCOVERY_CACHE_TTL = 30  # seconds
+_discovery_cache = None  # (monotonic timestamp, cache key, discovered dict)
+
+# Parallel health checks
+MAX_CHECK_WORKERS = 32
+DEFAULT_CHECK_BUDGET = 15  # seconds for a cycle's checks (restarts run after it); settings.total_budget_s
+DEFAULT_MIN_INTERVAL = 30  # seconds between health checks; override with settings.min_interval_s
+# Pools left running past the budget, with their checks; joined before exit
+_straggler_pools: List[Tuple[ThreadPoolExecutor, list]] = []
+
+# Down services
+DEFAULT_DOWN_DEBOUNCE = 60  # seconds a fresh outage is left alone; settings.down_debounce_s
+DEFAULT_MIN_RESTART_INTERVAL = 120  # seconds between restarts of one service; settings.min_restart_interval_s
+
+# Watch mode (--watch)
+DEFAULT_CHECK_INTERVAL = 300  # poll interval without events; settings.check_interval
+EVENT_SETTLE_DELAY = 2  # seconds to let a burst of container events settle
+EVENT_RECONNECT_DELAY = 10  # seconds before re-opening a dropped event stream
+
+# Shared HTTP sessions ("alerts", "probes"), created by http_session() on first use
+_sessions = {}
+_session_lock = threading.Lock()
+
+# Concurrent health probes per host (urlparse(url).netloc); override with settings.max_per_domain
+DEFAULT_MAX_PER_DOMAIN = 8
+_domain_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_domain_semaphores_lock = threading.Lock()
+
+# One restart at a time per compose project (concurrent `up`s race on shared networks)
+_compose_locks: Dict[str, threading.Lock] = {}
+_compose_locks_lock = threading.Lock()
+_compose_cmd = None  # compose argv prefix, set by compose_command() once a probe succeeds
+
 
 # ============================================================
 # AUTO-DISCOVERY
 # ============================================================
 
-def discover_containers(patterns: List[str] = None) -> List[dict]:
+def cached(key: str, ttl: float, fn):
     """
-    Auto-discover all NKFX-related containers.
-    No manual config needed for new bots.
+    Return fn(), reusing the value cached under key if it is younger than ttl seconds.
+    ttl <= 0 disables caching. Cached values are shared; treat them as read-only.
     """
-    if patterns is None:
-        patterns = DEFAULT_AUTO_PATTERNS
+    if ttl <= 0:
+        return fn()
     
-    discovered = []
-    seen_names = set()
+    with _ttl_cache_lock:
+        hit = _ttl_cache.get(key)
+    if hit is not None and time.monotonic() - hit[0] < ttl:
+        return hit[1]
+    
+    value = fn()
+    with _ttl_cache_lock:
+        _ttl_cache[key] = (time.monotonic(), value)
+    return value
+
+
+def invalidate_cached(key: str):
+    """Drop a cached() entry so the next lookup recomputes it."""
+    with _ttl_cache_lock:
+        _ttl_cache.pop(key, None)
+
+
+def get_snapshot(config: dict) -> Snapshot:
+    """snapshot_containers(), reused for settings.status_cache_ttl seconds."""
+    ttl = config.get('settings', {}).get('status_cache_ttl', DEFAULT_STATUS_CACHE_TTL)
+    return cached("containers", ttl, snapshot_containers)
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection over a UNIX socket, for talking to the Docker Engine API."""
+    
+    def __init__(self, socket_path: str, timeout: float = 10):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+    
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def docker_api_get(path: str, timeout: float = 10):
+    """GET a Docker Engine API path over the local socket and decode the JSON body."""
+    conn = _UnixHTTPConnection(DOCKER_SOCKET, timeout=timeout)
+    try:
+        conn.request("GET", path)
+        resp = conn.getresponse()
+        body = resp.read()
+        if resp.status != 200:
+            raise OSError(f"Docker API {path}: HTTP {resp.status}")
+        return json.loads(body)
+    finally:
+        conn.close()
+
+
+def _use_docker_api() -> bool:
+    """The API socket is only used when the docker CLI would talk to it too."""
+    docker_host = os.environ.get("DOCKER_HOST", "")
+    return docker_host in ("", f"unix://{DOCKER_SOCKET}") and os.path.exists(DOCKER_SOCKET)
+
+
+def snapshot_containers() -> Snapshot:
+    """
+    List all containers, running or not, in one call.
+    Queries the Docker Engine API over its UNIX socket (no fork/exec of the
+    docker CLI); falls back to a single `docker ps -a` if that fails.
+    Returns {container_name: (state, status)}, empty if docker is unavailable.
+    """
+    if _use_docker_api():
+        try:
+            snapshot = {}
+            for container in docker_api_get("/containers/json?all=1"):
+                entry = (container.get("State", ""), container.get("Status", ""))
+                for name in container.get("Names", []):
+                    name = name.lstrip("/")
+                    # Skip legacy link aliases ("/other/alias"), as docker ps does
+                    if "/" not in name:
+                        snapshot[name] = entry
+            return snapshot
+        except (OSError, ValueError, http.client.HTTPException) as e:
+            log.warning(f"Docker API unavailable ({e}), falling back to docker CLI")
     
-    # 1. Get all running containers
     try:
         result = subprocess.run(
-            ["docker", "ps", "--format", "{{.Names}}"],
+            ["docker", "ps", "-a", "--no-trunc", "--format", "{{.Names}}\t{{.State}}\t{{.Status}}"],
             capture_output=True, text=True, timeout=10
         )
-        running_containers = [c for c in result.stdout.strip().split('\n') if c]
     except Exception as e:
         log.error(f"Error listing containers: {e}")
-        running_containers = []
+        return {}
+    
+    snapshot = {}
+    for line in result.stdout.splitlines():
+        name, _, rest = line.partition('\t')
+        state, _, status = rest.partition('\t')
+        if name:
+            snapshot[name] = (state, status)
+    return snapshot
+
+
+def discover_containers(patterns: List[str] = None, snapshot: Snapshot = None) -> Dict[str, dict]:
+    """
+    Auto-discover all NKFX-related containers.
+    No manual config needed for new bots.
+    Returns {container_name: service}; the first source to find a name wins.
+    """
+    global _discovery_cache
+    
+    if patterns is None:
+        patterns = DEFAULT_AUTO_PATTERNS
+    
+    # 1. Get all live containers (what plain `docker ps` lists, so a
+    # crash-looping container stays discovered and gets reported down)
+    if snapshot is None:
+        snapshot = snapshot_containers()
+    running_containers = [n for n, (state, _) in snapshot.items() if state in LIVE_STATES]
+    
+    # Serve from cache if nothing discovery depends on has changed
+    cache_key = (tuple(patterns), frozenset(running_containers), _compose_dirs_mtimes())
+    if _discovery_cache is not None:
+        cached_at, cached_key, cached = _discovery_cache
+        if cached_key == cache_key and time.monotonic() - cached_at < DISCOVERY_CACHE_TTL:
+            return dict(cached)
+    
+    discovered = {}
     
     # 2. Auto-include containers matching patterns
+    auto_re = _AUTO_RE if patterns is DEFAULT_AUTO_PATTERNS else _compile_patterns(tuple(patterns))
     for container in running_containers:
-        if any(pattern in container.lower() for pattern in patterns):
-            if container not in seen_names:
-                discovered.append({
-                    'name': container,
-                    'type': 'docker',
-                    'critical': is_critical_container(container),
-                    'auto_discovered': True,
-                    'description': f'Auto-discovered: {container}'
-                })
-                seen_names.add(container)
+        if auto_re.search(container):
+            discovered.setdefault(container, {
+                'name': container,
+                'type': 'docker',
+                'critical': is_critical_container(container),
+                'auto_discovered': True,
+                'description': f'Auto-discovered: {container}'
+            })
     
     # 3. Also scan docker-compose files in /root/nkfx/bots/
-    bots_dir = '/root/nkfx/bots'
-    if os.path.exists(bots_dir):
-        for bot_folder in os.listdir(bots_dir):
-            bot_path = os.path.join(bots_dir, bot_folder)
-            if not os.path.isdir(bot_path):
-                continue
-                
-            compose_path = os.path.join(bot_path, 'docker-compose.yml')
-            if os.path.exists(compose_path):
-                try:
-                    with open(compose_path) as f:
-                        compose = yaml.safe_load(f)
-                        for service_name, service_config in compose.get('services', {}).items():
-                            # Use container_name if specified, otherwise service_name
-                            container_name = service_config.get('container_name', service_name) if isinstance(service_config, dict) else service_name
-                            if container_name not in seen_names:
-                                discovered.append({
-                                    'name': container_name,
-                                    'type': 'docker',
-                                    'critical': is_critical_container(container_name),
-                                    'compose_path': bot_path,
-                                    'auto_discovered': True,
-                                    'description': f'From compose: {bot_folder}'
-                                })
-                                seen_names.add(container_name)
-                except Exception as e:
-                    log.debug(f"Error reading {compose_path}: {e}")
+    try:
+        bot_entries = list(os.scandir(BOTS_DIR))
+    except OSError:
+        bot_entries = []
+    
+    for entry in bot_entries:
+        # DirEntry.is_dir() reuses the type from readdir, no extra stat
+        if entry.is_dir():
+            for svc in _scan_compose(entry.path, f'From compose: {entry.name}'):
+                discovered.setdefault(svc['name'], svc)
     
     # 4. Scan other compose locations
-    other_compose_dirs = [
-        '/root/trading-stack-smc',
-        '/root/nkfx/infrastructure',
-    ]
-    
-    for compose_dir in other_compose_dirs:
-        compose_path = os.path.join(compose_dir, 'docker-compose.yml')
-        if os.path.exists(compose_path):
-            try:
-                with open(compose_path) as f:
-                    compose = yaml.safe_load(f)
-                    for service_name, service_config in compose.get('services', {}).items():
-                        # Use container_name if specified, otherwise service_name
-                        container_name = service_config.get('container_name', service_name) if isinstance(service_config, dict) else service_name
-                        if container_name not in seen_names:
-                            discovered.append({
-                                'name': container_name,
-                                'type': 'docker',
-                                'critical': is_critical_container(container_name),
-                                'compose_path': compose_dir,
-                                'auto_discovered': True,
-                                'description': f'From: {compose_dir}'
-                            })
-                            seen_names.add(container_name)
-            except Exception as e:
-                log.debug(f"Error reading {compose_path}: {e}")
-    
-    return discovered
+    for compose_dir in OTHER_COMPOSE_DIRS:
+        for svc in _scan_compose(compose_dir, f'From: {compose_dir}'):
+            discovered.setdefault(svc['name'], svc)
+    
+    _discovery_cache = (time.monotonic(), cache_key, discovered)
+    return dict(discovered)
 
 
+def _scan_compose(compose_dir: str, description: str) -> List[dict]:
+    """List the services defined in compose_dir/docker-compose.yml (empty if none)."""
+    compose_path = os.path.join(compose_dir, 'docker-compose.yml')
+    # One stat for both the existence check and the YAML cache key
+    try:
+        mtime = os.stat(compose_path).st_mtime_ns
+    except FileNotFoundError:
+        return []
+    
+    services = []
+    try:
+        compose = load_yaml(compose_path, mtime)
+        for service_name, service_config in compose.get('services', {}).items():
+            # Use container_name if specified, otherwise service_name
+            container_name = service_config.get('container_name', service_name) if isinstance(service_config, dict) else service_name
+            services.append({
+                'name': container_name,
+                'type': 'docker',
+                'critical': is_critical_container(container_name),
+                'compose_path': compose_dir,
+                'auto_discovered': True,
+                'description': description
+            })
+    except Exception as e:
+        log.debug(f"Error reading {compose_path}: {e}")
+    return services
+
+
+def _compose_dirs_mtimes() -> tuple:
+    """Directory mtimes of the compose locations (changes when bots are added/removed)."""
+    mtimes = []
+    for path in [BOTS_DIR, *OTHER_COMPOSE_DIRS]:
+        try:
+            mtimes.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            mtimes.append(None)
+    return tuple(mtimes)
+
+
+@lru_cache(maxsize=512)
 def is_critical_container(name: str) -> bool:
-    """Determine if container is critical based on name."""
-    return any(p in name.lower() for p in CRITICAL_PATTERNS)
+    """Determine if container is critical based on name (memoized; names are stable)."""
+    return _CRIT_RE.search(name) is not None
 
 
-def get_all_services(config: dict) -> List[dict]:
+def get_all_services(config: dict, snapshot: Snapshot = None) -> List[dict]:
     """
     Get services from both config.yml AND auto-discovery.
     Auto-discovered services are merged with manual config.
     Manual config takes precedence for overrides.
     """
-    services = []
-    manual_names = set()
+    settings = config.get('settings', {})
     
     # 1. Load manual config first (these take precedence)
-    manual_services = config.get('services', [])
-    for svc in manual_services:
-        services.append(svc)
-        manual_names.add(svc['name'])
+    services = {svc['name']: svc for svc in config.get('services', [])}
     
     # 2. Auto-discover if enabled
-    if config.get('settings', {}).get('auto_discovery', True):
-        patterns = config.get('settings', {}).get('auto_patterns', DEFAULT_AUTO_PATTERNS)
-        discovered = discover_containers(patterns)
+    if settings.get('auto_discovery', True):
+        patterns = settings.get('auto_patterns', DEFAULT_AUTO_PATTERNS)
+        discovered = discover_containers(patterns, snapshot)
         
         # 3. Merge - don't duplicate, manual config wins
-        for d in discovered:
-            if d['name'] not in manual_names:
-                services.append(d)
-                log.debug(f"Auto-discovered: {d['name']}")
+        for name, d in discovered.items():
+            if services.setdefault(name, d) is d:
+                log.debug(f"Auto-discovered: {name}")
     
-    return services
+    return list(services.values())
 
 
 # ============================================================
 # CONFIG LOADING
 # ============================================================
 
+def load_yaml(path, mtime: int = None) -> dict:
+    """
+    Parse a YAML file, reusing the previous result while its mtime is unchanged.
+    Pass st_mtime_ns if the caller already stat'ed the file.
+    Callers must treat the returned dict as read-only.
+    """
+    path = str(path)
+    if mtime is None:
+        mtime = os.stat(path).st_mtime_ns
+    return _load_yaml_cached(path, mtime)
+
+
+@lru_cache(maxsize=64)
+def _load_yaml_cached(path: str, mtime: int) -> dict:
+    """Parse a YAML file. Keyed on mtime so edits invalidate the cache."""
+    with open(path) as f:
+        return yaml.load(f, Loader=SafeLoader) or {}
+
+
 def load_config() -> dict:
     """Load configuration from YAML file."""
     if not CONFIG_FILE.exists():
@@ -199,6 +443,7 @@ def load_config() -> dict:
                 'auto_restart': False,
                 'alert_on_restart': True,
                 'alert_on_recovery': True,
+                'alert_batching': True,
             },
             'telegram': {
                 'bot_token': os.environ.get('TELEGRAM_BOT_TOKEN', ''),
@@ -207,31 +452,111 @@ def load_config() -> dict:
             'services': []
         }
     
-    with open(CONFIG_FILE) as f:
-        return yaml.safe_load(f)
+    return load_yaml(CONFIG_FILE)
 
 
 def load_state() -> dict:
     """Load persistent state (restart counts, last check times)."""
     if STATE_FILE.exists():
         try:
+            if orjson is not None:
+                return orjson.loads(STATE_FILE.read_bytes())
             with open(STATE_FILE) as f:
                 return json.load(f)
-        except json.JSONDecodeError:
+        except ValueError:  # json/orjson decode errors
             return {}
     return {}
 
 
+def acquire_run_lock():
+    """
+    Take an exclusive, non-blocking lock so cron runs never overlap.
+    Returns the open lock file (keep it open to hold the lock), or None if
+    another run holds it. A separate lock file is used because save_state
+    replaces state.json, which would drop a lock held on it.
+    """
+    lock_file = open(LOCK_FILE, "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def to_epoch(value) -> Optional[int]:
+    """
+    Normalize a state timestamp to epoch seconds.
+    State stores ints; ISO strings from older state files are converted on read.
+    """
+    if value is None or isinstance(value, (int, float)):
+        return None if value is None else int(value)
+    try:
+        return int(datetime.fromisoformat(value).timestamp())
+    except (TypeError, ValueError):
+        return None
+
+
+def format_epoch(ts) -> str:
+    """Render a state timestamp for display."""
+    ts = to_epoch(ts)
+    if ts is None:
+        return "Never"
+    return time.strftime('%Y-%m-%d %H:%M:%S UTC', time.gmtime(ts))
+
+
 def save_state(state: dict):
-    """Save state to file."""
-    with open(STATE_FILE, "w") as f:
-        json.dump(state, f, indent=2, default=str)
+    """
+    Save state to file.
+    Written to a temp file, synced and renamed into place, so a crash
+    mid-write never leaves a truncated state.json behind.
+    """
+    if orjson is not None:
+        data = orjson.dumps(state, option=orjson.OPT_INDENT_2, default=str)
+    else:
+        data = json.dumps(state, indent=2, default=str).encode()
+    
+    tmp_file = STATE_FILE.with_suffix(".tmp")
+    with open(tmp_file, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, STATE_FILE)
 
 
 # ============================================================
 # TELEGRAM ALERTS
 # ============================================================
 
+def http_session(purpose: str = "alerts"):
+    """
+    Shared requests.Session per purpose, so calls reuse keep-alive connections.
+    "alerts" (Telegram) retries transient failures; "probes" (health
+    endpoints) never retries, so a flapping endpoint still shows up as down.
+    requests is imported here rather than at module load, so runs that never
+    touch the network (e.g. --status) don't pay for it.
+    """
+    session = _sessions.get(purpose)
+    if session is None:
+        with _session_lock:
+            session = _sessions.get(purpose)
+            if session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+                
+                retries = Retry(total=2, backoff_factor=0.2) if purpose == "alerts" else 0
+                adapter = HTTPAdapter(
+                    pool_connections=MAX_CHECK_WORKERS, pool_maxsize=MAX_CHECK_WORKERS,
+                    max_retries=retries
+                )
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _sessions[purpose] = session
+    return session
+
+
 def send_telegram(config: dict, message: str, parse_mode: str = "HTML"):
     """Send a Telegram message."""
     token = config.get("telegram", {}).get("bot_token", "")
@@ -249,7 +574,7 @@ def send_telegram(config: dict, message: str, parse_mode: str = "HTML"):
     }
     
     try:
-        resp = requests.post(url, json=payload, timeout=10)
+        resp = http_session().post(url, json=payload, timeout=10)
         if resp.status_code != 200:
             log.error(f"Telegram send failed: {resp.text}")
             return False
@@ -259,92 +584,197 @@ def send_telegram(config: dict, message: str, parse_mode: str = "HTML"):
         return False
 
 
-def alert_service_down(config: dict, service: dict, error: str, action: str, result: str):
-    """Send alert for service down."""
+def alert_service_down(config: dict, service: dict, error: str, action: str, result: str,
+                       now_ts: Optional[int] = None):
+    """Send alert for service down. now_ts is the check time (defaults to now)."""
     emoji = "🚨" if service.get("critical", False) else "⚠️"
     severity = "CRITICAL" if service.get("critical", False) else "WARNING"
     
     message = f"""
 {emoji} <b>NKFX {severity}: {service['name']} DOWN</b>
-━━━━━━━━━━━━━━━━━━━━━━
+{DIVIDER}
 <b>Service:</b> {service.get('description', service['name'])}
 <b>Status:</b> {error}
 <b>Action:</b> {action}
 <b>Result:</b> {result}
-<b>Time:</b> {datetime.now().strftime('%Y-%m-%d %H:%M:%S UTC')}
+<b>Time:</b> {format_epoch(now_ts or time.time())}
 """
     send_telegram(config, message.strip())
 
 
-def alert_service_recovered(config: dict, service: dict, downtime_mins: int):
-    """Send alert when service recovers."""
+def alert_service_recovered(config: dict, service: dict, downtime_mins: int,
+                            now_ts: Optional[int] = None):
+    """Send alert when service recovers. now_ts is the check time (defaults to now)."""
     message = f"""
 ✅ <b>NKFX RECOVERED: {service['name']}</b>
-━━━━━━━━━━━━━━━━━━━━━━
+{DIVIDER}
 <b>Service:</b> {service.get('description', service['name'])}
 <b>Downtime:</b> ~{downtime_mins} minutes
-<b>Time:</b> {datetime.now().strftime('%Y-%m-%d %H:%M:%S UTC')}
+<b>Time:</b> {format_epoch(now_ts or time.time())}
 """
     send_telegram(config, message.strip())
 
 
+def alert_batch(config: dict, alerts: List[tuple], now_ts: Optional[int] = None):
+    """
+    Send all alerts from one health-check cycle as a single message.
+    Alerts are ("down", service, error, action, result) or ("recovered", service, downtime_mins).
+    """
+    if not alerts:
+        return
+    
+    # A lone event keeps the familiar per-service format
+    if len(alerts) == 1:
+        kind, service, *details = alerts[0]
+        if kind == "down":
+            alert_service_down(config, service, *details, now_ts=now_ts)
+        else:
+            alert_service_recovered(config, service, *details, now_ts=now_ts)
+        return
+    
+    # Critical services first; otherwise alphabetical (alerts arrive in completion order)
+    down = sorted((a for a in alerts if a[0] == "down"),
+                  key=lambda a: (not a[1].get("critical", False), a[1]["name"]))
+    recovered = sorted((a for a in alerts if a[0] == "recovered"), key=lambda a: a[1]["name"])
+    critical = any(service.get("critical", False) for _, service, *_ in down)
+    emoji = "🚨" if critical else ("⚠️" if down else "✅")
+    
+    header = f"{emoji} <b>NKFX: {len(down)} down, {len(recovered)} recovered</b>"
+    
+    # One block per service, so a long batch is only ever split between services
+    blocks = []
+    if down:
+        blocks.append(DIVIDER)
+        for _, service, error, action, result in down:
+            severity = "CRITICAL" if service.get("critical", False) else "WARNING"
+            blocks.append("\n".join([
+                f"{'🚨' if severity == 'CRITICAL' else '⚠️'} <b>{service['name']} DOWN</b> ({severity})",
+                f"   <b>Service:</b> {service.get('description', service['name'])}",
+                f"   <b>Status:</b> {error}",
+                f"   <b>Action:</b> {action}",
+                f"   <b>Result:</b> {result}",
+            ]))
+    
+    if recovered:
+        blocks.append(DIVIDER)
+        for _, service, downtime_mins in recovered:
+            blocks.append("\n".join([
+                f"✅ <b>{service['name']} RECOVERED</b> after ~{downtime_mins} minutes",
+                f"   <b>Service:</b> {service.get('description', service['name'])}",
+            ]))
+    
+    blocks.append(f"{DIVIDER}\n<b>Time:</b> {format_epoch(now_ts or time.time())}")
+    
+    for message in split_message(header, blocks):
+        send_telegram(config, message)
+
+
+def telegram_length(text: str) -> int:
+    """Message length as Telegram counts it (UTF-16 code units)."""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def split_message(header: str, blocks: List[str]) -> List[str]:
+    """
+    Join header and blocks into as few messages as fit TELEGRAM_MAX_LENGTH,
+    breaking only between blocks. Later messages repeat the header.
+    """
+    messages = []
+    current = [header]
+    for block in blocks:
+        if len(current) > 1 and telegram_length("\n".join(current + [block])) > TELEGRAM_MAX_LENGTH:
+            messages.append("\n".join(current))
+            current = [f"{header} (continued)"]
+        current.append(block)
+    messages.append("\n".join(current))
+    return messages
+
+
 # ============================================================
 # HEALTH CHECKS
 # ============================================================
 
-def check_docker_container(name: str, pattern: str = None) -> Tuple[bool, str]:
+def check_docker_container(name: str, pattern: str = None, snapshot: Snapshot = None) -> Tuple[bool, str]:
     """
     Check if a Docker container is running.
+    Matches against a snapshot_containers() result; takes a fresh one if not given.
     Returns (is_running, status_message)
     """
-    search_name = pattern or name
+    if snapshot is None:
+        snapshot = snapshot_containers()
     
-    try:
-        # First try exact name match
-        result = subprocess.run(
-            ["docker", "ps", "--filter", f"name=^{name}$", "--format", "{{.Status}}"],
-            capture_output=True, text=True, timeout=10
-        )
-        status = result.stdout.strip()
-        
-        # If not found, try pattern match
-        if not status and pattern:
-            result = subprocess.run(
-                ["docker", "ps", "--filter", f"name={pattern}", "--format", "{{.Status}}"],
-                capture_output=True, text=True, timeout=10
-            )
-            status = result.stdout.strip()
-        
-        # Also try without anchors for partial matches
-        if not status:
-            result = subprocess.run(
-                ["docker", "ps", "--filter", f"name={search_name}", "--format", "{{.Status}}"],
-                capture_output=True, text=True, timeout=10
-            )
-            status = result.stdout.strip()
-        
-        if status:
-            # Check if it's actually running (not just existing)
-            if "Up" in status:
-                return True, status
-            else:
-                return False, f"Container exists but not running: {status}"
+    # First try exact name match
+    entry = snapshot.get(name)
+    
+    # If not found or not running (a stale exited container can share the
+    # service's name), try the container_pattern (a regex, like docker's name
+    # filter) or a partial name match, preferring running containers
+    if entry is None or entry[0] != 'running':
+        if pattern:
+            pattern_re = _compile_container_pattern(pattern)
+            matches = [e for n, e in snapshot.items() if pattern_re.search(n)]
         else:
-            return False, "Container not found"
-            
-    except subprocess.TimeoutExpired:
-        return False, "Docker command timeout"
-    except Exception as e:
-        return False, f"Error: {e}"
+            matches = [e for n, e in snapshot.items() if name in n]
+        fallback = entry if entry is not None else (matches[0] if matches else None)
+        entry = next((e for e in matches if e[0] == 'running'), fallback)
+    
+    if entry is None:
+        return False, "Container not found"
+    
+    state, status = entry
+    if state == 'running':
+        return True, status
+    return False, f"Container exists but not running: {status}"
+
+
+_HEALTH_RE = re.compile(r'\((healthy|unhealthy|health: starting)\)$')
+
+
+def container_health(status: str) -> Optional[str]:
+    """
+    Docker HEALTHCHECK result from a container's status text, e.g.
+    "Up 2 hours (healthy)" -> "healthy". The docker API and `docker ps` both
+    append it, so no extra inspect call is needed.
+    Returns "healthy", "unhealthy", "starting", or None without a HEALTHCHECK.
+    """
+    match = _HEALTH_RE.search(status or "")
+    if match is None:
+        return None
+    return match.group(1).replace("health: ", "")
+
 
+def probe_health_endpoint(url: str, max_per_domain: int = DEFAULT_MAX_PER_DOMAIN) -> Tuple[bool, str]:
+    """check_health_endpoint(), reusing a result younger than ENDPOINT_CACHE_TTL."""
+    return cached(f"endpoint:{url}", ENDPOINT_CACHE_TTL,
+                  lambda: check_health_endpoint(url, max_per_domain=max_per_domain))
 
-def check_health_endpoint(url: str, timeout: int = 5) -> Tuple[bool, str]:
+
+def domain_semaphore(url: str, limit: int = DEFAULT_MAX_PER_DOMAIN) -> threading.BoundedSemaphore:
+    """
+    Per-host probe limiter, created on first use.
+    The limit is fixed when a host is first seen.
+    """
+    host = urllib.parse.urlparse(url).netloc
+    with _domain_semaphores_lock:
+        sem = _domain_semaphores.get(host)
+        if sem is None:
+            sem = _domain_semaphores[host] = threading.BoundedSemaphore(max(1, limit))
+    return sem
+
+
+def check_health_endpoint(url: str, timeout: int = 5,
+                          max_per_domain: int = DEFAULT_MAX_PER_DOMAIN) -> Tuple[bool, str]:
     """
     Check if a health endpoint returns 200.
+    At most max_per_domain probes run against one host at a time.
     Returns (is_healthy, status_message)
     """
+    session = http_session("probes")
+    import requests  # already loaded by http_session()
+    
     try:
-        resp = requests.get(url, timeout=timeout)
+        with domain_semaphore(url, max_per_domain):
+            resp = session.get(url, timeout=timeout)
         if resp.status_code == 200:
             return True, "HTTP 200 OK"
         else:
@@ -357,11 +787,88 @@ def check_health_endpoint(url: str, timeout: int = 5) -> Tuple[bool, str]:
         return False, f"Error: {e}"
 
 
-def restart_service(service: dict) -> Tuple[bool, str]:
+def compose_command() -> Optional[List[str]]:
+    """
+    Find a working compose CLI, probed once per process.
+    Prefers `docker compose` (v2), falls back to `docker-compose` (v1).
+    A failed probe isn't cached, so it's retried on the next restart
+    (e.g. after the docker daemon comes back in --watch mode).
+    """
+    global _compose_cmd
+    if _compose_cmd is not None:
+        return _compose_cmd
+    
+    try:
+        result = subprocess.run(
+            ["docker", "compose", "version"],
+            capture_output=True, text=True, timeout=10
+        )
+        if result.returncode == 0:
+            _compose_cmd = ["docker", "compose"]
+    except (OSError, subprocess.TimeoutExpired):
+        pass
+    
+    if _compose_cmd is None and shutil.which("docker-compose"):
+        _compose_cmd = ["docker-compose"]
+    return _compose_cmd
+
+
+def container_exists(name: str, snapshot: Snapshot = None) -> bool:
+    """Check whether a container with this exact name exists (any state)."""
+    if snapshot is not None:
+        return name in snapshot
+    try:
+        result = subprocess.run(
+            ["docker", "inspect", "-f", "{{.State.Status}}", name],
+            capture_output=True, text=True, timeout=10
+        )
+        return result.returncode == 0
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+
+
+def compose_lock(compose_path: Optional[str]) -> threading.Lock:
+    """Lock shared by restarts in one compose project (services without one get their own)."""
+    if not compose_path:
+        return threading.Lock()
+    key = os.path.normpath(compose_path)
+    with _compose_locks_lock:
+        lock = _compose_locks.get(key)
+        if lock is None:
+            lock = _compose_locks[key] = threading.Lock()
+    return lock
+
+
+def restart_service(service: dict, snapshot: Snapshot = None) -> Tuple[bool, str]:
     """
-    Attempt to restart a service via docker compose.
+    Attempt to restart a service.
+    An existing container gets a plain `docker restart`; docker compose is only
+    used to recreate a missing container (or if the plain restart fails).
+    Restarts of services in the same compose project run one at a time.
     Returns (success, message)
     """
+    with compose_lock(service.get("compose_path")):
+        return _restart_service(service, snapshot)
+
+
+def _restart_service(service: dict, snapshot: Snapshot = None) -> Tuple[bool, str]:
+    """restart_service() without the per-project lock."""
+    name = service['name']
+    
+    if container_exists(name, snapshot):
+        try:
+            result = subprocess.run(
+                ["docker", "restart", name],
+                capture_output=True, text=True, timeout=30
+            )
+            if result.returncode == 0:
+                return True, "Restarted successfully"
+            log.warning(f"docker restart {name} failed: {result.stderr[:200]}")
+        except subprocess.TimeoutExpired:
+            log.warning(f"docker restart {name} timed out (30s)")
+        except Exception as e:
+            log.warning(f"docker restart {name} error: {e}")
+    
     compose_path = service.get("compose_path")
     
     if not compose_path:
@@ -370,15 +877,17 @@ def restart_service(service: dict) -> Tuple[bool, str]:
     if not os.path.isdir(compose_path):
         return False, f"Compose path not found: {compose_path}"
     
+    cmd = compose_command()
+    if not cmd:
+        return False, "docker compose not available"
+    
     try:
-        # Try docker compose (v2) first, fallback to docker-compose (v1)
-        for cmd in ["docker compose", "docker-compose"]:
-            result = subprocess.run(
-                f"cd {compose_path} && {cmd} up -d {service['name']}",
-                shell=True, capture_output=True, text=True, timeout=120
-            )
-            if result.returncode == 0:
-                return True, "Restarted successfully"
+        result = subprocess.run(
+            [*cmd, "up", "-d", service['name']],
+            cwd=compose_path, capture_output=True, text=True, timeout=120
+        )
+        if result.returncode == 0:
+            return True, "Restarted successfully"
         
         return False, f"Restart failed: {result.stderr[:200]}"
         
@@ -392,48 +901,95 @@ def restart_service(service: dict) -> Tuple[bool, str]:
 # MAIN HEALTH CHECK LOGIC
 # ============================================================
 
-def check_service(service: dict, config: dict, state: dict) -> dict:
-    """
-    Check a single service and handle alerts/restarts.
-    Returns updated service state.
-    """
-    name = service["name"]
-    service_state = state.get(name, {
+def new_service_state() -> dict:
+    """State entry for a service that has never been checked."""
+    return {
         "last_status": "unknown",
         "last_check": None,
         "down_since": None,
         "restart_count_today": 0,
-        "restart_count_total": 0
-    })
-    
-    # Reset daily restart count if new day
-    last_check = service_state.get("last_check")
-    if last_check:
-        try:
-            last_date = datetime.fromisoformat(last_check).date()
-            if last_date != datetime.now().date():
-                service_state["restart_count_today"] = 0
-        except:
-            pass
-    
-    # Perform checks
-    is_healthy = True
-    error_msg = ""
+        "restart_count_total": 0,
+        "last_restart": None
+    }
+
+
+def down_debounced(service: dict, service_state: dict, settings: dict,
+                   snapshot: Snapshot, now_ts: int) -> bool:
+    """
+    Whether a service that went down moments ago should be left alone
+    (no probe, restart or alert): true within settings.down_debounce_s,
+    unless its container is running again.
+    """
+    down_since = to_epoch(service_state.get("down_since"))
+    debounce = settings.get("down_debounce_s", DEFAULT_DOWN_DEBOUNCE)
+    if service_state.get("last_status") != "down" or down_since is None or now_ts - down_since >= debounce:
+        return False
+    if service.get("type") != "docker":
+        return True
+    return not check_docker_container(service["name"], service.get("container_pattern"), snapshot)[0]
+
+
+def run_checks(service: dict, config: dict, snapshot: Snapshot = None) -> Tuple[bool, str]:
+    """
+    Run the docker and health endpoint checks for one service.
+    Touches no state, so it is safe to run in a worker thread.
+    Returns (is_healthy, error_message)
+    """
+    settings = config.get("settings", {})
     
     # Check 1: Docker container running
+    docker_health = None
     if service.get("type") == "docker":
-        pattern = service.get("container_pattern")
-        running, status = check_docker_container(name, pattern)
+        running, status = check_docker_container(service["name"], service.get("container_pattern"), snapshot)
         if not running:
-            is_healthy = False
-            error_msg = status
+            return False, status
+        docker_health = container_health(status)
     
-    # Check 2: Health endpoint (if container is running)
-    if is_healthy and service.get("health_endpoint"):
-        healthy, status = check_health_endpoint(service["health_endpoint"])
+    # Check 2: Health endpoint (if container is running), unless the
+    # container's own HEALTHCHECK already reports it healthy
+    if service.get("health_endpoint") and docker_health != "healthy":
+        max_per_domain = settings.get("max_per_domain", DEFAULT_MAX_PER_DOMAIN)
+        healthy, status = probe_health_endpoint(service["health_endpoint"], max_per_domain)
         if not healthy:
-            is_healthy = False
-            error_msg = f"Health check failed: {status}"
+            return False, f"Health check failed: {status}"
+    
+    return True, ""
+
+
+def check_service(service: dict, config: dict, state: dict, snapshot: Snapshot = None,
+                  alerts: List[tuple] = None, now_ts: int = None,
+                  result: Tuple[bool, str] = None) -> dict:
+    """
+    Check a single service and handle alerts/restarts.
+    If an alerts list is given, alerts are appended to it (for alert_batch)
+    instead of being sent immediately.
+    now_ts is the cycle's epoch time, shared by all services in a run.
+    result is a run_checks() result already collected for this cycle;
+    the checks are run here if it isn't given.
+    Returns updated service state, a copy; `state` itself is never modified,
+    so callers on worker threads can leave the merge to the main thread.
+    """
+    name = service["name"]
+    if now_ts is None:
+        now_ts = int(time.time())
+    service_state = {**new_service_state(), **state.get(name, {})}
+    
+    # Older state files stored ISO strings; normalize to epoch seconds
+    service_state["down_since"] = to_epoch(service_state.get("down_since"))
+    
+    # Reset daily restart count if new (UTC) day
+    last_check = to_epoch(service_state.get("last_check"))
+    if last_check is not None and last_check // 86400 != now_ts // 86400:
+        service_state["restart_count_today"] = 0
+    
+    settings = config.get("settings", {})
+    
+    if down_debounced(service, service_state, settings, snapshot, now_ts):
+        service_state["last_check"] = now_ts
+        return service_state
+    
+    # Perform checks
+    is_healthy, error_msg = result if result is not None else run_checks(service, config, snapshot)
     
     # Handle status change
     was_healthy = service_state.get("last_status") == "healthy"
@@ -442,14 +998,13 @@ def check_service(service: dict, config: dict, state: dict) -> dict:
         # Service is healthy
         if not was_healthy and service_state.get("down_since"):
             # Just recovered
-            try:
-                down_since = datetime.fromisoformat(service_state["down_since"])
-                downtime = int((datetime.now() - down_since).total_seconds() / 60)
-            except:
-                downtime = 0
+            downtime = (now_ts - service_state["down_since"]) // 60
             
-            if config.get("settings", {}).get("alert_on_recovery", True):
-                alert_service_recovered(config, service, downtime)
+            if settings.get("alert_on_recovery", True):
+                if alerts is not None:
+                    alerts.append(("recovered", service, downtime))
+                else:
+                    alert_service_recovered(config, service, downtime, now_ts)
             
             log.info(f"✅ {name} recovered after {downtime} minutes")
         
@@ -458,9 +1013,9 @@ def check_service(service: dict, config: dict, state: dict) -> dict:
         
     else:
         # Service is down
-        if was_healthy or service_state.get("last_status") == "unknown":
-            # Just went down
-            service_state["down_since"] = datetime.now().isoformat()
+        if service_state.get("down_since") is None:
+            # Just went down (a timed-out check keeps the original down_since)
+            service_state["down_since"] = now_ts
             log.warning(f"🚨 {name} is DOWN: {error_msg}")
         
         service_state["last_status"] = "down"
@@ -469,68 +1024,221 @@ def check_service(service: dict, config: dict, state: dict) -> dict:
         action = "Manual intervention needed"
         result = "❌ Auto-restart disabled"
         
-        if config.get("settings", {}).get("auto_restart", False):
-            action = "Attempting restart..."
-            success, result_msg = restart_service(service)
+        if settings.get("auto_restart", False):
+            last_restart = to_epoch(service_state.get("last_restart"))
+            since_restart = None if last_restart is None else now_ts - last_restart
             
-            if success:
-                result = "✅ Restarted successfully"
-                service_state["restart_count_today"] += 1
-                service_state["restart_count_total"] += 1
-                log.info(f"✅ {name} restarted successfully")
+            if since_restart is not None and since_restart < settings.get(
+                    "min_restart_interval_s", DEFAULT_MIN_RESTART_INTERVAL):
+                action = "Restart skipped"
+                result = f"⏸ Last restart {since_restart}s ago"
+                log.info(f"⏸ {name} was restarted {since_restart}s ago, not restarting again yet")
             else:
-                result = f"❌ {result_msg}"
-                log.error(f"❌ {name} restart failed: {result_msg}")
+                action = "Attempting restart..."
+                success, result_msg = restart_service(service, snapshot)
+                service_state["last_restart"] = now_ts
+                
+                if success:
+                    result = "✅ Restarted successfully"
+                    service_state["restart_count_today"] += 1
+                    service_state["restart_count_total"] += 1
+                    log.info(f"✅ {name} restarted successfully")
+                else:
+                    result = f"❌ {result_msg}"
+                    log.error(f"❌ {name} restart failed: {result_msg}")
         
         # Send alert
-        if config.get("settings", {}).get("alert_on_restart", True):
-            alert_service_down(config, service, error_msg, action, result)
+        if settings.get("alert_on_restart", True):
+            if alerts is not None:
+                alerts.append(("down", service, error_msg, action, result))
+            else:
+                alert_service_down(config, service, error_msg, action, result, now_ts)
     
-    service_state["last_check"] = datetime.now().isoformat()
+    service_state["last_check"] = now_ts
     return service_state
 
 
-def run_health_check(config: dict):
+def run_health_check(config: dict, services: List[dict] = None, snapshot: Snapshot = None):
     """Run health check on all services."""
     state = load_state()
     
     log.info("=" * 50)
     log.info("Starting health check...")
     
+    # One docker ps for the whole cycle
+    if snapshot is None:
+        snapshot = get_snapshot(config)
+    
     # Get all services (manual + auto-discovered)
-    services = get_all_services(config)
+    if services is None:
+        services = get_all_services(config, snapshot)
     healthy_count = 0
     down_count = 0
+    timed_out_count = 0
     
     log.info(f"Checking {len(services)} services...")
     
-    for service in services:
-        name = service["name"]
-        service_state = check_service(service, config, state)
-        state[name] = service_state
+    # One clock read for the whole cycle
+    now_ts = int(time.time())
+    
+    # Collect alerts and send one Telegram message per cycle unless disabled
+    alerts = [] if config.get("settings", {}).get("alert_batching", True) else None
+    
+    # Checks are I/O bound (docker + HTTP), so run them concurrently, bounded
+    # by a total budget so one hung check can't stall the cycle. Workers only
+    # check; state updates, restarts and alerts happen below, outside the budget.
+    if services:
+        # Forget pools whose stragglers have all finished since (--watch keeps running)
+        _straggler_pools[:] = [(ex, fs) for ex, fs in _straggler_pools if not all(f.done() for f in fs)]
         
-        if service_state["last_status"] == "healthy":
-            healthy_count += 1
-        else:
-            down_count += 1
+        settings = config.get("settings", {})
+        budget = settings.get("total_budget_s", DEFAULT_CHECK_BUDGET)
+        deadline = time.monotonic() + budget
+        
+        to_check = [svc for svc in services
+                    if not down_debounced(svc, state.get(svc["name"], {}), settings, snapshot, now_ts)]
+        checked = {svc["name"] for svc in to_check}
+        results = {}
+        
+        ex = ThreadPoolExecutor(max_workers=min(MAX_CHECK_WORKERS, max(1, len(to_check))))
+        futures = {ex.submit(run_checks, svc, config, snapshot): svc for svc in to_check}
+        try:
+            # Record results as they finish, until the deadline
+            for future in as_completed(futures, timeout=max(0, deadline - time.monotonic())):
+                name = futures[future]["name"]
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    log.error(f"❌ {name} check failed: {e}")
+                    results[name] = (False, f"Check error: {e}")
+        except FuturesTimeoutError:  # not the builtin TimeoutError before Python 3.11
+            pass
+        finally:
+            # Don't wait for stragglers on the way out
+            ex.shutdown(wait=False, cancel_futures=True)
+        
+        if len(results) < len(to_check):
+            _straggler_pools.append((ex, list(futures)))
+        
+        timed_out = [svc for svc in to_check if svc["name"] not in results]
+        for service in timed_out:
+            name = service["name"]
+            log.error(f"⏱ {name} check did not finish within {budget}s")
+            service_state = {**new_service_state(), **state.get(name, {})}
+            service_state["last_status"] = "timeout"
+            service_state["last_check"] = now_ts
+            state[name] = service_state
+        timed_out_count = len(timed_out)
+        
+        # Apply results; restarts can take minutes, so they run in parallel
+        # with no deadline and always get recorded. check_service returns a
+        # copy, so the merge into `state` below is the only write to it.
+        finished = [svc for svc in services if svc["name"] in results or svc["name"] not in checked]
+        if finished:
+            with ThreadPoolExecutor(max_workers=min(MAX_CHECK_WORKERS, len(finished))) as pool:
+                updated = pool.map(
+                    lambda svc: check_service(svc, config, state, snapshot, alerts, now_ts,
+                                              results.get(svc["name"])),
+                    finished)
+                for service, service_state in zip(finished, updated):
+                    state[service["name"]] = service_state
+                    if service_state["last_status"] == "healthy":
+                        healthy_count += 1
+                    else:
+                        down_count += 1
     
-    state["last_full_check"] = datetime.now().isoformat()
+    if alerts:
+        alert_batch(config, alerts, now_ts)
+    
+    state["last_full_check"] = now_ts
     state["services_checked"] = len(services)
     save_state(state)
     
-    log.info(f"Health check complete: {healthy_count} healthy, {down_count} down")
+    log.info(f"Health check complete: {healthy_count} healthy, {down_count} down, {timed_out_count} timed out")
+
+
+# ============================================================
+# WATCH MODE
+# ============================================================
+
+def watch_docker_events(wake: threading.Event):
+    """
+    Follow the Docker Engine event stream and set `wake` whenever a container
+    starts, stops, dies or changes health. Reconnects if the stream drops.
+    Runs forever; meant for a daemon thread.
+    """
+    filters = json.dumps({"type": ["container"], "event": ["start", "stop", "die", "health_status"]})
+    path = f"/events?filters={urllib.parse.quote(filters)}"
+    
+    while True:
+        conn = _UnixHTTPConnection(DOCKER_SOCKET, timeout=None)
+        try:
+            conn.request("GET", path)
+            resp = conn.getresponse()
+            if resp.status != 200:
+                raise OSError(f"HTTP {resp.status}")
+            log.info("Watching Docker events")
+            
+            for line in iter(resp.readline, b""):
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                name = event.get("Actor", {}).get("Attributes", {}).get("name", "?")
+                log.info(f"Docker event: {name} {event.get('Action', '')}")
+                wake.set()
+        except (OSError, ValueError, http.client.HTTPException) as e:
+            log.warning(f"Docker event stream error: {e}")
+        finally:
+            conn.close()
+        
+        time.sleep(EVENT_RECONNECT_DELAY)
+
+
+def watch(config: dict):
+    """
+    Long-running alternative to cron (--watch).
+    Container events (start/stop/die/health) trigger a check right away;
+    otherwise services are polled every settings.check_interval seconds,
+    which is still what catches failing health endpoints.
+    """
+    wake = threading.Event()
+    if _use_docker_api():
+        threading.Thread(target=watch_docker_events, args=(wake,), name="docker-events", daemon=True).start()
+    else:
+        log.warning("Docker API socket not available, watching by polling only")
+    
+    while True:
+        started = time.monotonic()
+        wake.clear()
+        
+        # Pick up config edits, and never reuse a snapshot from before the event
+        config = load_config()
+        invalidate_cached("containers")
+        try:
+            run_health_check(config)
+        except Exception as e:
+            log.error(f"Health check failed: {e}")
+        
+        settings = config.get('settings', {})
+        interval = settings.get('check_interval', DEFAULT_CHECK_INTERVAL)
+        min_interval = settings.get('min_interval_s', DEFAULT_MIN_INTERVAL)
+        
+        if wake.wait(timeout=max(0, interval - (time.monotonic() - started))):
+            # Let bursts (e.g. a compose restart) settle, and keep checks min_interval_s apart
+            time.sleep(max(EVENT_SETTLE_DELAY, min_interval - (time.monotonic() - started)))
 
 
 # ============================================================
 # DAILY SUMMARY
 # ============================================================
 
-def send_daily_summary(config: dict):
+def send_daily_summary(config: dict, services: List[dict] = None):
     """Send daily health summary."""
     state = load_state()
-    services = get_all_services(config)
+    if services is None:
+        services = get_all_services(config)
     
-    lines = ["📊 <b>NKFX Daily Health Report</b>", "━━━━━━━━━━━━━━━━━━━━━━"]
+    lines = ["📊 <b>NKFX Daily Health Report</b>", DIVIDER]
     
     total_restarts = 0
     critical_down = 0
@@ -546,24 +1254,14 @@ def send_daily_summary(config: dict):
         if service.get("auto_discovered"):
             auto_discovered_count += 1
         
-        if status == "healthy":
-            emoji = "✅"
-            status_text = "Running"
-        elif status == "down":
-            emoji = "❌"
-            status_text = "DOWN"
-            if service.get("critical"):
-                critical_down += 1
-        else:
-            emoji = "❓"
-            status_text = "Unknown"
+        if status == "down" and service.get("critical"):
+            critical_down += 1
         
-        line = f"{emoji} {name}: {status_text}"
-        if restarts > 0:
-            line += f" (restarted {restarts}x)"
-        lines.append(line)
+        emoji, status_text = STATUS_EMOJI.get(status, UNKNOWN_STATUS)
+        suffix = f" (restarted {restarts}x)" if restarts > 0 else ""
+        lines.append(f"{emoji} {name}: {status_text}{suffix}")
     
-    lines.append("━━━━━━━━━━━━━━━━━━━━━━")
+    lines.append(DIVIDER)
     lines.append(f"<b>Services:</b> {len(services)} ({auto_discovered_count} auto-discovered)")
     lines.append(f"<b>Total restarts today:</b> {total_restarts}")
     
@@ -572,7 +1270,7 @@ def send_daily_summary(config: dict):
     else:
         lines.append("✅ All critical services healthy")
     
-    lines.append(f"\n<i>Generated: {datetime.now().strftime('%Y-%m-%d %H:%M UTC')}</i>")
+    lines.append(f"\n<i>Generated: {time.strftime('%Y-%m-%d %H:%M UTC', time.gmtime())}</i>")
     
     message = "\n".join(lines)
     send_telegram(config, message)
@@ -583,10 +1281,26 @@ def send_daily_summary(config: dict):
 # STATUS DISPLAY
 # ============================================================
 
-def show_status(config: dict):
-    """Display current status of all services."""
+def show_status(config: dict, services: List[dict] = None, snapshot: Snapshot = None, deep: bool = False):
+    """
+    Display current status of all services.
+    Health endpoints are only probed with deep=True (--deep); otherwise
+    this is docker state plus the saved state file, no network calls.
+    """
     state = load_state()
-    services = get_all_services(config)
+    if snapshot is None:
+        snapshot = get_snapshot(config)
+    if services is None:
+        services = get_all_services(config, snapshot)
+    
+    endpoint_results = {}
+    if deep:
+        endpoints = {s["name"]: s["health_endpoint"] for s in services if s.get("health_endpoint")}
+        if endpoints:
+            max_per_domain = config.get("settings", {}).get("max_per_domain", DEFAULT_MAX_PER_DOMAIN)
+            with ThreadPoolExecutor(max_workers=min(MAX_CHECK_WORKERS, len(endpoints))) as ex:
+                results = ex.map(lambda url: probe_health_endpoint(url, max_per_domain), endpoints.values())
+                endpoint_results = dict(zip(endpoints, results))
     
     print("\n" + "=" * 70)
     print("NKFX SERVICE STATUS")
@@ -600,13 +1314,23 @@ def show_status(config: dict):
         svc_state = state.get(name, {})
         
         # Do a live check
+        docker_health = None
         if service.get("type") == "docker":
             pattern = service.get("container_pattern")
-            running, live_status = check_docker_container(name, pattern)
+            running, live_status = check_docker_container(name, pattern, snapshot)
             live = "✅" if running else "❌"
+            if running:
+                docker_health = container_health(live_status)
         else:
             live = "?"
         
+        health = f"| Health: {docker_health} (docker)" if docker_health else ""
+        if name in endpoint_results:
+            healthy, health_status = endpoint_results[name]
+            health = f"| Health: {health_status}"
+            if not healthy:
+                live = "❌"
+        
         restarts = svc_state.get("restart_count_today", 0)
         critical = "[CRIT]" if service.get("critical") else ""
         auto = "[AUTO]" if service.get("auto_discovered") else ""
@@ -616,19 +1340,19 @@ def show_status(config: dict):
         else:
             manual_count += 1
         
-        print(f"{live} {name:30} | Restarts: {restarts:2} | {critical:6} {auto}")
+        print(f"{live} {name:30} | Restarts: {restarts:2} | {critical:6} {auto:6} {health}".rstrip())
     
     print("=" * 70)
     print(f"Total: {len(services)} services ({manual_count} manual, {auto_count} auto-discovered)")
-    last_check = state.get("last_full_check", "Never")
+    last_check = format_epoch(state.get("last_full_check"))
     print(f"Last check: {last_check}")
     print()
 
 
-def show_discovered(config: dict):
+def show_discovered(config: dict, snapshot: Snapshot = None):
     """Show all auto-discovered containers."""
     patterns = config.get('settings', {}).get('auto_patterns', DEFAULT_AUTO_PATTERNS)
-    discovered = discover_containers(patterns)
+    discovered = discover_containers(patterns, snapshot)
     
     print("\n" + "=" * 60)
     print("AUTO-DISCOVERED CONTAINERS")
@@ -636,7 +1360,7 @@ def show_discovered(config: dict):
     print(f"Patterns: {', '.join(patterns)}")
     print("-" * 60)
     
-    for d in discovered:
+    for d in discovered.values():
         critical = "[CRITICAL]" if d.get("critical") else ""
         print(f"  {d['name']:30} {critical:10} {d.get('description', '')}")
     
@@ -655,25 +1379,75 @@ def main():
                         help="Send daily summary")
     parser.add_argument("--status", action="store_true",
                         help="Show current status")
+    parser.add_argument("--deep", action="store_true",
+                        help="With --status, also probe health endpoints")
     parser.add_argument("--discover", action="store_true",
                         help="Show auto-discovered containers")
     parser.add_argument("--test-alert", action="store_true",
                         help="Send test alert")
+    parser.add_argument("--watch", action="store_true",
+                        help="Run continuously, re-checking on Docker container events")
     args = parser.parse_args()
     
-    config = load_config()
-    
-    if args.daily:
-        send_daily_summary(config)
-    elif args.status:
-        show_status(config)
-    elif args.discover:
-        show_discovered(config)
-    elif args.test_alert:
-        send_telegram(config, "🔔 <b>NKFX Health Monitor Test</b>\n\nThis is a test alert. Monitoring is working correctly.")
-        print("Test alert sent!")
-    else:
-        run_health_check(config)
+    _log_listener.start()
+    try:
+        config = load_config()
+        
+        if args.test_alert:
+            send_telegram(config, "🔔 <b>NKFX Health Monitor Test</b>\n\nThis is a test alert. Monitoring is working correctly.")
+            print("Test alert sent!")
+            return
+        
+        if args.watch:
+            # Holding the run lock makes cron health checks skip while the watcher is up
+            run_lock = acquire_run_lock()
+            if run_lock is None:
+                log.error("Another health check or watcher is running, exiting")
+                return
+            # Exit through the finally below on a supervisor stop, so logs are flushed
+            signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+            try:
+                watch(config)
+            except (KeyboardInterrupt, SystemExit):
+                log.info("Watcher stopped")
+            return
+        
+        run_lock = None
+        if not (args.daily or args.status or args.discover):
+            # Cron health check: skip if a previous run is still going or finished very recently
+            run_lock = acquire_run_lock()
+            if run_lock is None:
+                log.info("Previous health check still running, skipping")
+                return
+            
+            min_interval = config.get('settings', {}).get('min_interval_s', DEFAULT_MIN_INTERVAL)
+            last_check = to_epoch(load_state().get("last_full_check"))
+            if last_check is not None and time.time() - last_check < min_interval:
+                log.info(f"Skipping health check, last check {int(time.time() - last_check)}s ago")
+                return
+        
+        # One docker ps and one discovery pass for the whole invocation
+        snapshot = get_snapshot(config)
+        
+        if args.discover:
+            show_discovered(config, snapshot)
+            return
+        
+        services = get_all_services(config, snapshot)
+        
+        if args.daily:
+            send_daily_summary(config, services)
+        elif args.status:
+            show_status(config, services, snapshot, deep=args.deep)
+        else:
+            run_health_check(config, services, snapshot)
+    finally:
+        # Let checks that outlived their budget finish (their probes have
+        # timeouts), so whatever they log still reaches the listener
+        for ex, _ in _straggler_pools:
+            ex.shutdown(wait=True)
+        # Flush queued log records before exit
+        _log_listener.stop()
 
 
 if __name__ == "__main__":